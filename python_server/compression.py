@@ -0,0 +1,199 @@
+import struct
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+# Формат меток времени, который пишет SQLite (CURRENT_TIMESTAMP, UTC)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Корзины delta-of-delta: (префикс, число бит значения)
+_DOD_BUCKETS = [
+    ('10', 7),
+    ('110', 9),
+    ('1110', 12),
+]
+
+
+def timestamp_to_ms(timestamp: str) -> int:
+    """Перевод метки времени SQLite (UTC) в миллисекунды от эпохи"""
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(round(dt.timestamp() * 1000))
+
+
+def ms_to_timestamp(ms: int) -> str:
+    """Обратное преобразование в формат SQLite"""
+    dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    text = dt.strftime(TIMESTAMP_FORMAT)
+    if ms % 1000:
+        text += f".{ms % 1000:03d}"
+    return text
+
+
+class _BitWriter:
+    def __init__(self):
+        self._chunks = []
+        self._length = 0
+
+    def write(self, value: int, nbits: int):
+        if nbits:
+            self._chunks.append(format(value & ((1 << nbits) - 1), f'0{nbits}b'))
+            self._length += nbits
+
+    def write_bits(self, bits: str):
+        self._chunks.append(bits)
+        self._length += len(bits)
+
+    def to_bytes(self) -> bytes:
+        bits = ''.join(self._chunks)
+        bits += '0' * (-len(bits) % 8)
+        if not bits:
+            return b''
+        return int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+class _BitReader:
+    def __init__(self, data: bytes):
+        self._bits = format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b') if data else ''
+        self._pos = 0
+
+    def read(self, nbits: int) -> int:
+        if nbits == 0:
+            return 0
+        chunk = self._bits[self._pos:self._pos + nbits]
+        if len(chunk) < nbits:
+            raise ValueError("Неожиданный конец блока")
+        self._pos += nbits
+        return int(chunk, 2)
+
+    def read_bit(self) -> int:
+        return self.read(1)
+
+
+def _to_signed(value: int, nbits: int) -> int:
+    if value >= 1 << (nbits - 1):
+        value -= 1 << nbits
+    return value
+
+
+def encode_timestamps(timestamps: List[int]) -> bytes:
+    """Кодирование меток времени (мс) методом delta-of-delta"""
+    writer = _BitWriter()
+    prev = prev_delta = 0
+    for i, ts in enumerate(timestamps):
+        if i == 0:
+            writer.write(ts, 64)
+        else:
+            delta = ts - prev
+            dod = delta - prev_delta
+            if dod == 0:
+                writer.write_bits('0')
+            else:
+                for prefix, nbits in _DOD_BUCKETS:
+                    if -(1 << (nbits - 1)) <= dod < (1 << (nbits - 1)):
+                        writer.write_bits(prefix)
+                        writer.write(dod, nbits)
+                        break
+                else:
+                    writer.write_bits('1111')
+                    writer.write(dod, 64)
+            prev_delta = delta
+        prev = ts
+    return writer.to_bytes()
+
+
+def decode_timestamps(data: bytes, count: int) -> List[int]:
+    """Декодирование меток времени из блока"""
+    reader = _BitReader(data)
+    result = []
+    prev = prev_delta = 0
+    for i in range(count):
+        if i == 0:
+            ts = _to_signed(reader.read(64), 64)
+        else:
+            if reader.read_bit() == 0:
+                dod = 0
+            else:
+                for _, nbits in _DOD_BUCKETS:
+                    if reader.read_bit() == 0:
+                        dod = _to_signed(reader.read(nbits), nbits)
+                        break
+                else:
+                    dod = _to_signed(reader.read(64), 64)
+            prev_delta += dod
+            ts = prev + prev_delta
+        result.append(ts)
+        prev = ts
+    return result
+
+
+def _float_to_bits(value: float) -> int:
+    return struct.unpack('>Q', struct.pack('>d', value))[0]
+
+
+def _bits_to_float(bits: int) -> float:
+    return struct.unpack('>d', struct.pack('>Q', bits))[0]
+
+
+def encode_values(values: List[float]) -> bytes:
+    """XOR-кодирование значений (как в Gorilla)"""
+    writer = _BitWriter()
+    prev = 0
+    prev_leading = prev_trailing = -1
+    for i, value in enumerate(values):
+        bits = _float_to_bits(value)
+        if i == 0:
+            writer.write(bits, 64)
+            prev = bits
+            continue
+
+        xor = bits ^ prev
+        prev = bits
+        if xor == 0:
+            writer.write_bits('0')
+            continue
+
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if prev_leading >= 0 and leading >= prev_leading and trailing >= prev_trailing:
+            # Значащие биты помещаются в предыдущее окно
+            writer.write_bits('10')
+            writer.write(xor >> prev_trailing, 64 - prev_leading - prev_trailing)
+        else:
+            meaningful = 64 - leading - trailing
+            writer.write_bits('11')
+            writer.write(leading, 5)
+            writer.write(meaningful & 0x3F, 6)  # 64 кодируется как 0
+            writer.write(xor >> trailing, meaningful)
+            prev_leading, prev_trailing = leading, trailing
+    return writer.to_bytes()
+
+
+def decode_values(data: bytes, count: int) -> List[float]:
+    """Декодирование значений из блока"""
+    reader = _BitReader(data)
+    result = []
+    prev = 0
+    leading = trailing = 0
+    for i in range(count):
+        if i == 0:
+            prev = reader.read(64)
+        elif reader.read_bit() == 1:
+            if reader.read_bit() == 1:
+                leading = reader.read(5)
+                meaningful = reader.read(6) or 64
+                trailing = 64 - leading - meaningful
+            prev ^= reader.read(64 - leading - trailing) << trailing
+        result.append(_bits_to_float(prev))
+    return result
+
+
+def encode_block(samples: List[Tuple[int, float]]) -> Tuple[bytes, bytes]:
+    """Кодирование блока (метка времени в мс, значение)"""
+    return (encode_timestamps([ts for ts, _ in samples]),
+            encode_values([value for _, value in samples]))
+
+
+def decode_block(timestamps: bytes, values: bytes, count: int) -> List[Tuple[int, float]]:
+    """Декодирование блока в список (метка времени в мс, значение)"""
+    return list(zip(decode_timestamps(timestamps, count), decode_values(values, count)))
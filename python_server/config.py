@@ -8,4 +8,17 @@ class Config:
     SERVER_PORT = 8080
     BUFFER_SIZE = 4096
 
+    # Сжатие старых данных в блоки (None - отключено)
+    COMPACT_AFTER_DAYS = 7
+    COMPACT_INTERVAL = 3600  # сек между проверками
+
+    # Фильтрация входящих данных по типу сенсора:
+    # deadband, deadband_percent, heartbeat (сек), drop_duplicates
+    SENSOR_FILTERS = {
+        "TEMPERATURE": {"deadband": 0.1, "heartbeat": 60},
+        "VOLTAGE": {"deadband_percent": 1.0, "heartbeat": 60},
+    }
+    # Переопределения для отдельных устройств (адрес "ip:port" или "ip")
+    DEVICE_FILTERS = {}
+
 config = Config()
\ No newline at end of file
@@ -1,11 +1,17 @@
 import sqlite3
 import logging
-from datetime import datetime
-from typing import List, Dict, Optional
+import heapq
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+
+from compression import encode_block, decode_block, timestamp_to_ms, ms_to_timestamp
+from ingest_filter import SensorFilter
 
 class STM32Database:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, sensor_filter: Optional[SensorFilter] = None):
         self.db_path = db_path
+        self.sensor_filter = sensor_filter
         self.init_database()
     
     def init_database(self):
@@ -26,6 +32,31 @@ class STM32Database:
                 )
             ''')
             
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_stm32_data_address_time
+                ON stm32_data (stm32_address, timestamp)
+            ''')
+
+            # Сжатые блоки старых данных (по устройству и типу сенсора)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS stm32_blocks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    stm32_address TEXT NOT NULL,
+                    sensor_type TEXT NOT NULL,
+                    sample_count INTEGER NOT NULL,
+                    t_start INTEGER NOT NULL,
+                    t_end INTEGER NOT NULL,
+                    v_min REAL NOT NULL,
+                    v_max REAL NOT NULL,
+                    timestamps BLOB NOT NULL,
+                    vals BLOB NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_stm32_blocks_range
+                ON stm32_blocks (stm32_address, t_end, t_start)
+            ''')
+            
             # Таблица для команд управления
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS commands (
@@ -54,7 +85,10 @@ class STM32Database:
             conn.commit()
     
     def save_sensor_data(self, address: str, sensor_type: str, value: float, raw_data: bytes = None):
-        """Сохранение данных от STM32"""
+        """Сохранение данных от STM32 (None, если значение отброшено фильтром)"""
+        if self.sensor_filter and not self.sensor_filter.accept(address, sensor_type, value):
+            return None
+        
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -100,7 +134,7 @@ class STM32Database:
             return [dict(row) for row in cursor.fetchall()]
     
     def get_sensor_data(self, address: str, limit: int = 100) -> List[Dict]:
-        """Получение исторических данных"""
+        """Получение исторических данных (включая сжатые блоки)"""
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
@@ -110,7 +144,151 @@ class STM32Database:
                 ORDER BY timestamp DESC
                 LIMIT ?
             ''', (address, limit))
-            return [dict(row) for row in cursor.fetchall()]
+            rows = [dict(row) for row in cursor.fetchall()]
+            raw_keys = sorted(timestamp_to_ms(row['timestamp']) for row in rows)
+            
+            # Блоки отбираются по метаданным от новых к старым: следующий блок не нужен,
+            # если новее его конца уже набрано limit записей
+            cursor.execute('''
+                SELECT * FROM stm32_blocks
+                WHERE stm32_address = ?
+                ORDER BY t_end DESC
+            ''', (address,))
+            blocks = []
+            pending = []  # (-t_start, sample_count) блоков, еще не целиком новее порога
+            newer = 0
+            for block in cursor:
+                threshold = block['t_end']
+                while pending and -pending[0][0] > threshold:
+                    newer += heapq.heappop(pending)[1]
+                if newer + len(raw_keys) - bisect_right(raw_keys, threshold) >= limit:
+                    break
+                blocks.append(block)
+                heapq.heappush(pending, (-block['t_start'], block['sample_count']))
+            
+            if not blocks:
+                return rows
+            candidates = [(timestamp_to_ms(row['timestamp']), row) for row in rows]
+            for block in blocks:
+                candidates.extend(self._decode_block_items(block))
+            candidates.sort(key=lambda item: item[0], reverse=True)
+            return [row for _, row in candidates[:limit]]
+    
+    def get_sensor_data_range(self, address: str, start: datetime = None, end: datetime = None,
+                              sensor_type: str = None) -> List[Dict]:
+        """Получение данных за период (в UTC) в хронологическом порядке"""
+        start_ms = timestamp_to_ms(start.isoformat()) if start else None
+        end_ms = timestamp_to_ms(end.isoformat()) if end else None
+        
+        query = "SELECT * FROM stm32_data WHERE stm32_address = ?"
+        block_query = "SELECT * FROM stm32_blocks WHERE stm32_address = ?"
+        params, block_params = [address], [address]
+        if sensor_type:
+            query += " AND sensor_type = ?"
+            block_query += " AND sensor_type = ?"
+            params.append(sensor_type)
+            block_params.append(sensor_type)
+        if start:
+            query += " AND timestamp >= ?"
+            block_query += " AND t_end >= ?"
+            params.append(ms_to_timestamp(start_ms))
+            block_params.append(start_ms)
+        if end:
+            query += " AND timestamp <= ?"
+            block_query += " AND t_start <= ?"
+            params.append(ms_to_timestamp(end_ms))
+            block_params.append(end_ms)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+            
+            cursor.execute(block_query, block_params)
+            for block in cursor:
+                rows.extend(row for _, row in self._decode_block_items(block, start_ms, end_ms))
+        
+        rows.sort(key=lambda row: timestamp_to_ms(row['timestamp']))
+        return rows
+    
+    def compact_sensor_data(self, older_than_days: float = 7, block_size: int = 1024) -> int:
+        """Сжатие старых данных в блоки, возвращает число упакованных записей"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        compacted = 0
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            # В блоки попадают только обычные числовые записи без сырых данных
+            cursor.execute('''
+                SELECT DISTINCT stm32_address, sensor_type FROM stm32_data
+                WHERE timestamp < ? AND raw_data IS NULL AND status = 'received'
+                  AND typeof(value) IN ('real', 'integer')
+            ''', (cutoff,))
+            series = cursor.fetchall()
+            
+            for address, sensor_type in series:
+                last_ts, last_id = '', 0
+                while True:
+                    # Ряд читается страницами по block_size (keyset по timestamp, id)
+                    cursor.execute('''
+                        SELECT id, timestamp, value FROM stm32_data
+                        WHERE stm32_address = ? AND sensor_type = ?
+                          AND timestamp < ? AND raw_data IS NULL AND status = 'received'
+                          AND typeof(value) IN ('real', 'integer')
+                          AND (timestamp > ? OR (timestamp = ? AND id > ?))
+                        ORDER BY timestamp, id
+                        LIMIT ?
+                    ''', (address, sensor_type, cutoff, last_ts, last_ts, last_id, block_size))
+                    chunk = cursor.fetchall()
+                    if not chunk:
+                        break
+                    
+                    samples = [(timestamp_to_ms(ts), float(value)) for _, ts, value in chunk]
+                    ts_blob, values_blob = encode_block(samples)
+                    values = [value for _, value in samples]
+                    cursor.execute('''
+                        INSERT INTO stm32_blocks (stm32_address, sensor_type, sample_count,
+                                                  t_start, t_end, v_min, v_max, timestamps, vals)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (address, sensor_type, len(samples), samples[0][0], samples[-1][0],
+                          min(values), max(values), ts_blob, values_blob))
+                    cursor.executemany("DELETE FROM stm32_data WHERE id = ?",
+                                       [(row_id,) for row_id, _, _ in chunk])
+                    # Фиксация по каждому блоку, чтобы не держать блокировку записи
+                    conn.commit()
+                    
+                    compacted += len(chunk)
+                    last_id, last_ts = chunk[-1][0], chunk[-1][1]
+        
+        logging.info(f"Сжато записей: {compacted}")
+        return compacted
+    
+    def clear_sensor_data(self):
+        """Удаление всей истории данных, включая сжатые блоки"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM stm32_data")
+            cursor.execute("DELETE FROM stm32_blocks")
+            conn.commit()
+    
+    @staticmethod
+    def _decode_block_items(block: sqlite3.Row, start_ms: int = None, end_ms: int = None) -> List[Tuple[int, Dict]]:
+        """Развертывание блока в пары (метка времени в мс, запись формата stm32_data)"""
+        rows = []
+        for ts, value in decode_block(block['timestamps'], block['vals'], block['sample_count']):
+            if (start_ms is not None and ts < start_ms) or (end_ms is not None and ts > end_ms):
+                continue
+            rows.append((ts, {
+                'id': None,
+                'timestamp': ms_to_timestamp(ts),
+                'stm32_address': block['stm32_address'],
+                'sensor_type': block['sensor_type'],
+                'value': value,
+                'raw_data': None,
+                'status': 'received',
+            }))
+        return rows
     
     def log_connection_event(self, address: str, event_type: str, details: str = None):
         """Логирование событий соединения"""
@@ -2,7 +2,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
 from datetime import datetime
+from config import config
 from database import STM32Database
+from ingest_filter import SensorFilter
 from network_server import STM32Server
 
 class STM32ManagerApp:
@@ -12,8 +14,9 @@ class STM32ManagerApp:
         self.root.geometry("1000x700")
         
         # Инициализация базы данных и сервера
-        self.db = STM32Database("stm32_data.db")
-        self.server = STM32Server("0.0.0.0", 8080, self.db)
+        self.db = STM32Database("stm32_data.db", SensorFilter.from_config(config))
+        self.server = STM32Server("0.0.0.0", 8080, self.db,
+                                  config.COMPACT_AFTER_DAYS, config.COMPACT_INTERVAL)
         
         self.setup_ui()
         self.start_server()
@@ -181,6 +184,9 @@ class STM32ManagerApp:
                 row['sensor_type'],
                 row['value']
             ))
+        
+        suppressed = self.db.sensor_filter.get_suppressed_count()
+        self.status_var.set(f"Отфильтровано значений: {suppressed}")
     
     def export_to_csv(self):
         """Экспорт данных в CSV"""
@@ -203,10 +209,7 @@ class STM32ManagerApp:
         """Очистка истории данных"""
         if messagebox.askyesno("Подтверждение", "Очистить всю историю данных?"):
             try:
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM stm32_data")
-                    conn.commit()
+                self.db.clear_sensor_data()
                 self.refresh_data()
                 self.status_var.set("История данных очищена")
             except Exception as e:
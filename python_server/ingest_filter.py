@@ -0,0 +1,117 @@
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class FilterRule:
+    """Настройки фильтра для типа сенсора или устройства"""
+    deadband: float = 0.0          # абсолютная зона нечувствительности
+    deadband_percent: float = 0.0  # зона в процентах от последнего значения
+    heartbeat: float = 0.0         # максимальная пауза между записями, сек
+    drop_duplicates: bool = True   # отбрасывать точные повторы
+
+
+class SensorFilter:
+    """Фильтр входящих данных: deadband, heartbeat и подавление повторов"""
+
+    def __init__(self, sensor_rules: Dict[str, dict] = None, device_rules: Dict[str, dict] = None):
+        # Правила проверяются один раз при создании, а не на каждом значении
+        self.sensor_rules = {name: self._make_rule(name, settings)
+                             for name, settings in (sensor_rules or {}).items()}
+        self.device_rules = dict(device_rules or {})
+        for name, settings in self.device_rules.items():
+            self._make_rule(name, settings)
+        self._last: Dict[Tuple[str, str], Tuple[float, float]] = {}  # (адрес, сенсор) -> (значение, время)
+        self._suppressed: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'SensorFilter':
+        return cls(config.SENSOR_FILTERS, config.DEVICE_FILTERS)
+
+    @staticmethod
+    def _make_rule(name: str, settings: dict) -> FilterRule:
+        try:
+            rule = FilterRule(**settings)
+        except TypeError as e:
+            raise ValueError(f"Неверное правило фильтра для {name}: {e}") from e
+
+        for field in ('deadband', 'deadband_percent', 'heartbeat'):
+            value = getattr(rule, field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"Неверное правило фильтра для {name}: "
+                                 f"{field} должно быть неотрицательным числом, получено {value!r}")
+            setattr(rule, field, float(value))
+        if not isinstance(rule.drop_duplicates, bool):
+            raise ValueError(f"Неверное правило фильтра для {name}: "
+                             f"drop_duplicates должно быть True или False, получено {rule.drop_duplicates!r}")
+        return rule
+
+    def get_rule(self, address: str, sensor_type: str) -> Optional[FilterRule]:
+        """Итоговые настройки: правила устройства перекрывают правила сенсора"""
+        rule = self.sensor_rules.get(sensor_type)
+        # Порт клиента меняется при переподключении, поэтому ищем и по хосту
+        device = self.device_rules.get(address)
+        if device is None:
+            device = self.device_rules.get(address.rsplit(':', 1)[0])
+        if device:
+            rule = replace(rule or FilterRule(), **device)
+        return rule
+
+    def accept(self, address: str, sensor_type: str, value: float, now: float = None) -> bool:
+        """Проверка, нужно ли сохранять значение"""
+        # Нечисловые значения сохраняются без фильтрации
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return True
+        rule = self.get_rule(address, sensor_type)
+        if rule is None:
+            return True
+
+        now = time.monotonic() if now is None else now
+        key = (address, sensor_type)
+        with self._lock:
+            last = self._last.get(key)
+            if last is None or self._should_store(rule, last, value, now):
+                self._last[key] = (value, now)
+                return True
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+
+    @staticmethod
+    def _should_store(rule: FilterRule, last: Tuple[float, float], value: float, now: float) -> bool:
+        last_value, last_time = last
+        if rule.heartbeat and now - last_time >= rule.heartbeat:
+            return True
+        if value == last_value:
+            return not rule.drop_duplicates
+
+        # Сравнение идет с последним сохраненным значением, чтобы не накапливать дрейф
+        delta = abs(value - last_value)
+        if rule.deadband and delta <= rule.deadband:
+            return False
+        if rule.deadband_percent and delta <= abs(last_value) * rule.deadband_percent / 100:
+            return False
+        return True
+
+    def get_suppressed_count(self, address: str = None, sensor_type: str = None) -> int:
+        """Количество отброшенных значений (с фильтрацией по адресу и сенсору)"""
+        with self._lock:
+            return sum(count for (addr, sensor), count in self._suppressed.items()
+                       if (address is None or addr == address)
+                       and (sensor_type is None or sensor == sensor_type))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика отброшенных значений по сенсорам"""
+        with self._lock:
+            stats = {}
+            for (_, sensor_type), count in self._suppressed.items():
+                stats[sensor_type] = stats.get(sensor_type, 0) + count
+            return stats
+
+    def reset(self, address: str = None):
+        """Сброс состояния фильтра (например, при отключении устройства)"""
+        with self._lock:
+            for key in [key for key in self._last if address is None or key[0] == address]:
+                del self._last[key]
@@ -0,0 +1,259 @@
+import argparse
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from config import config
+from database import STM32Database
+
+# Индексы stm32_data, которые при defer_indexes удаляются на время загрузки
+DEFERRED_INDEXES = ["idx_stm32_data_address_time"]
+
+# Преобразование строки старой таблицы sensor_data в формат stm32_data
+_LEGACY_COLUMNS = '''
+    COALESCE(timestamp, '1970-01-01 00:00:00') AS timestamp,
+    COALESCE(address, 'unknown') AS stm32_address,
+    COALESCE(sensor_type, 'UNKNOWN') AS sensor_type,
+    value
+'''
+
+# Контрольная сумма фрагмента, одинаково считаемая для обеих таблиц
+_CHECKSUM = '''
+    SELECT COUNT(*), TOTAL(value), TOTAL(LENGTH(stm32_address)),
+           TOTAL(LENGTH(sensor_type)), MIN(timestamp), MAX(timestamp)
+    FROM ({})
+'''
+
+
+class LegacyMigrator:
+    """Перенос данных из таблицы sensor_data (main.py) в stm32_data
+
+    По умолчанию индексы остаются на месте, а запись блокируется только на время
+    одного фрагмента, поэтому перенос можно выполнять при работающем сервере.
+    С defer_indexes индексы удаляются на время загрузки и строятся заново в конце:
+    это быстрее, но построение индекса блокирует запись в базу на все время
+    работы, поэтому такой режим предназначен для остановленного сервера.
+
+    База переводится в режим журнала WAL, чтобы сервер мог читать данные во время
+    переноса. Этот режим сохраняется в файле базы и после завершения переноса.
+
+    Строки старой таблицы без значения (value IS NULL) не переносятся: их число
+    выводится в журнал для каждого фрагмента и в итоге.
+    """
+
+    def __init__(self, db_path: str, chunk_size: int = 500000, defer_indexes: bool = False):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.defer_indexes = defer_indexes
+
+    def _connect(self) -> sqlite3.Connection:
+        # Транзакции управляются вручную, между фрагментами сервер может писать в базу
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        # Режим WAL постоянный: он остается включенным для базы и после переноса
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA cache_size = -200000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _init_state(self, conn: sqlite3.Connection):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS legacy_migration (
+                chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_from INTEGER NOT NULL,
+                source_to INTEGER NOT NULL,
+                target_from INTEGER,
+                target_to INTEGER,
+                row_count INTEGER NOT NULL,
+                checksum TEXT NOT NULL,
+                migrated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    def _has_legacy_table(self, conn: sqlite3.Connection) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sensor_data'"
+        ).fetchone()
+        return row is not None
+
+    def get_progress(self) -> Dict:
+        """Текущий прогресс: последний перенесенный id и число строк"""
+        with sqlite3.connect(self.db_path) as conn:
+            self._init_state(conn)
+            last_id, copied = conn.execute(
+                "SELECT COALESCE(MAX(source_to), 0), COALESCE(SUM(row_count), 0) FROM legacy_migration"
+            ).fetchone()
+            max_id = 0
+            if self._has_legacy_table(conn):
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM sensor_data").fetchone()[0]
+            return {'last_id': last_id, 'max_id': max_id, 'rows_copied': copied}
+
+    def migrate(self) -> int:
+        """Перенос данных фрагментами, с продолжением с последней контрольной точки"""
+        STM32Database(self.db_path)  # создание актуальной схемы и недостающих индексов
+        conn = self._connect()
+        indexes_dropped = False
+        try:
+            self._init_state(conn)
+            if not self._has_legacy_table(conn):
+                logging.info("Таблица sensor_data не найдена, переносить нечего")
+                return 0
+
+            progress = self.get_progress()
+            last_id, max_id = progress['last_id'], progress['max_id']
+            if last_id >= max_id:
+                logging.info("Перенос уже выполнен")
+                return 0
+
+            if self.defer_indexes:
+                for index in DEFERRED_INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {index}")
+                indexes_dropped = True
+
+            copied = skipped = 0
+            started = datetime.now()
+            while last_id < max_id:
+                chunk_to = min(last_id + self.chunk_size, max_id)
+                chunk_copied, chunk_skipped = self._copy_chunk(conn, last_id, chunk_to)
+                copied += chunk_copied
+                skipped += chunk_skipped
+                if chunk_skipped:
+                    logging.warning(f"Пропущено строк без значения в id {last_id}-{chunk_to}: {chunk_skipped}")
+                last_id = chunk_to
+                logging.info(f"Перенесено {copied} строк, id {last_id}/{max_id} "
+                             f"({datetime.now() - started})")
+        finally:
+            conn.close()
+            if indexes_dropped:
+                # Индексы восстанавливаются и при прерванном переносе
+                logging.info("Построение индексов")
+                STM32Database(self.db_path)
+
+        logging.info(f"Перенос завершен: {copied} строк, пропущено без значения: {skipped}")
+        return copied
+
+    def _copy_chunk(self, conn: sqlite3.Connection, source_from: int, source_to: int) -> Tuple[int, int]:
+        """Перенос строк с id в (source_from, source_to] одной транзакцией
+
+        Возвращает число перенесенных и пропущенных (без значения) строк.
+        """
+        source_query = f'''
+            SELECT {_LEGACY_COLUMNS} FROM sensor_data
+            WHERE id > {source_from} AND id <= {source_to} AND value IS NOT NULL
+        '''
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(f'''
+                INSERT INTO stm32_data (timestamp, stm32_address, sensor_type, value)
+                {source_query} ORDER BY id
+            ''')
+            row_count = cursor.rowcount
+            target_from = target_to = None
+            if row_count:
+                # Блокировка записи гарантирует непрерывный диапазон новых id
+                target_to = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                target_from = target_to - row_count + 1
+
+            source_sum = self._checksum(conn, source_query)
+            target_sum = self._target_checksum(conn, target_from, target_to)
+            if source_sum != target_sum:
+                raise RuntimeError(f"Контрольные суммы не совпадают для id {source_from}-{source_to}")
+
+            conn.execute('''
+                INSERT INTO legacy_migration (source_from, source_to, target_from, target_to,
+                                              row_count, checksum)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (source_from, source_to, target_from, target_to, row_count, repr(source_sum)))
+            skipped = conn.execute(f'''
+                SELECT COUNT(*) FROM sensor_data
+                WHERE id > {source_from} AND id <= {source_to} AND value IS NULL
+            ''').fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row_count, skipped
+
+    @staticmethod
+    def _checksum(conn: sqlite3.Connection, query: str) -> Tuple:
+        return tuple(conn.execute(_CHECKSUM.format(query)).fetchone())
+
+    def _target_checksum(self, conn: sqlite3.Connection, target_from: Optional[int],
+                         target_to: Optional[int]) -> Tuple:
+        if target_from is None:
+            target_from, target_to = 0, -1
+        return self._checksum(conn, f'''
+            SELECT timestamp, stm32_address, sensor_type, value FROM stm32_data
+            WHERE id >= {target_from} AND id <= {target_to}
+        ''')
+
+    def verify(self) -> bool:
+        """Повторная сверка количества строк и контрольных сумм всех фрагментов
+
+        Сверка имеет смысл до сжатия перенесенных данных (compact_sensor_data).
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            self._init_state(conn)
+            chunks = conn.execute('''
+                SELECT source_from, source_to, target_from, target_to, row_count, checksum
+                FROM legacy_migration ORDER BY source_from
+            ''').fetchall()
+            if not self._has_legacy_table(conn):
+                # Без старой таблицы сверять нечего, если ничего и не переносилось
+                return not chunks
+            ok = True
+            expected = 0
+            for source_from, source_to, target_from, target_to, row_count, checksum in chunks:
+                source_sum = self._checksum(conn, f'''
+                    SELECT {_LEGACY_COLUMNS} FROM sensor_data
+                    WHERE id > {source_from} AND id <= {source_to} AND value IS NOT NULL
+                ''')
+                target_sum = self._target_checksum(conn, target_from, target_to)
+                if not (source_sum == target_sum and repr(source_sum) == checksum
+                        and source_sum[0] == row_count):
+                    logging.error(f"Расхождение во фрагменте id {source_from}-{source_to}")
+                    ok = False
+                expected += row_count
+
+            last_id = chunks[-1][1] if chunks else 0
+            total = conn.execute(
+                "SELECT COUNT(*) FROM sensor_data WHERE id <= ? AND value IS NOT NULL", (last_id,)
+            ).fetchone()[0]
+            if total != expected:
+                logging.error(f"Количество строк не совпадает: {total} != {expected}")
+                ok = False
+
+            skipped = conn.execute(
+                "SELECT COUNT(*) FROM sensor_data WHERE id <= ? AND value IS NULL", (last_id,)
+            ).fetchone()[0]
+            if skipped:
+                logging.warning(f"Строк без значения, не перенесенных из sensor_data: {skipped}")
+            return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Перенос данных из sensor_data в stm32_data",
+        epilog="База переводится в режим журнала WAL, и этот режим сохраняется после переноса. "
+               "Строки без значения не переносятся, их число выводится в журнал.")
+    parser.add_argument("--db", default=config.DB_PATH, help="путь к базе данных")
+    parser.add_argument("--chunk-size", type=int, default=500000, help="строк в одной транзакции")
+    parser.add_argument("--verify-only", action="store_true", help="только сверка перенесенных данных")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="строить индексы после загрузки (быстрее, но только при остановленном сервере)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    migrator = LegacyMigrator(args.db, args.chunk_size, args.defer_indexes)
+    if not args.verify_only:
+        migrator.migrate()
+    if migrator.verify():
+        logging.info("Сверка пройдена")
+    else:
+        logging.error("Сверка не пройдена")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,13 @@ from datetime import datetime
 from database import STM32Database
 
 class STM32Server:
-    def __init__(self, host: str, port: int, db: STM32Database):
+    def __init__(self, host: str, port: int, db: STM32Database,
+                 compact_after_days: float = None, compact_interval: float = 3600):
         self.host = host
         self.port = port
         self.db = db
+        self.compact_after_days = compact_after_days
+        self.compact_interval = compact_interval
         self.clients = {}  # address -> (socket, thread)
         self.running = False
         self.server_socket = None
@@ -33,6 +36,12 @@ class STM32Server:
         command_thread = threading.Thread(target=self._command_dispatcher)
         command_thread.daemon = True
         command_thread.start()
+        
+        # Поток для периодического сжатия старых данных
+        if self.compact_after_days is not None:
+            compact_thread = threading.Thread(target=self._compaction_loop)
+            compact_thread.daemon = True
+            compact_thread.start()
     
     def _accept_connections(self):
         """Принятие входящих подключений"""
@@ -72,6 +81,8 @@ class STM32Server:
             if client_id in self.clients:
                 del self.clients[client_id]
             client_socket.close()
+            if self.db.sensor_filter:
+                self.db.sensor_filter.reset(client_id)
             self.db.log_connection_event(client_id, "disconnected")
             logging.info(f"Клиент отключен: {client_id}")
     
@@ -137,6 +148,16 @@ class STM32Server:
             except Exception as e:
                 logging.error(f"Ошибка диспетчера команд: {e}")
     
+    def _compaction_loop(self):
+        """Периодическое сжатие старых данных в блоки"""
+        while self.running:
+            try:
+                self.db.compact_sensor_data(self.compact_after_days)
+            except Exception as e:
+                logging.error(f"Ошибка сжатия данных: {e}")
+            
+            threading.Event().wait(self.compact_interval)
+    
     def _send_command_to_client(self, client_id: str, command: dict):
         """Отправка команды конкретному клиенту"""
         try: